@@ -7,7 +7,9 @@ Configures realm, clients, users, and scopes via Keycloak Admin API
 import json
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any
 
 KEYCLOAK_URL = "http://localhost:8080"
@@ -21,19 +23,29 @@ class KeycloakSetup:
         self.admin_user = ADMIN_USER
         self.admin_password = ADMIN_PASSWORD
         self.access_token = None
+        self.scope_ids: Dict[str, str] = {}
 
-    def wait_for_keycloak(self, max_retries: int = 30):
-        """Wait for Keycloak to be ready"""
+        # Reuse connections to Keycloak across all setup calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def wait_for_keycloak(self, timeout: float = 60.0):
+        """Wait for Keycloak to be ready, polling with exponential backoff"""
         print("Waiting for Keycloak to be ready...")
-        for i in range(max_retries):
+        delay = 0.25
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
             try:
-                response = requests.get(f"{self.base_url}/realms/master")
+                response = self.session.get(f"{self.base_url}/realms/master", timeout=1.0)
                 if response.status_code == 200:
                     print("✓ Keycloak is ready")
                     return True
-            except requests.exceptions.ConnectionError:
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
                 pass
-            time.sleep(2)
+            time.sleep(delay)
+            delay = min(delay * 2, 4.0)
         print("✗ Keycloak did not become ready in time")
         return False
 
@@ -49,9 +61,11 @@ class KeycloakSetup:
         }
 
         try:
-            response = requests.post(url, data=data)
+            response = self.session.post(url, data=data)
             if response.status_code == 200:
                 self.access_token = response.json()["access_token"]
+                # JSON bodies set their own Content-Type via json=
+                self.session.headers.update({"Authorization": f"Bearer {self.access_token}"})
                 print("✓ Admin token obtained")
                 return True
             else:
@@ -65,14 +79,9 @@ class KeycloakSetup:
         """Create MCP realm"""
         print("Creating MCP realm...")
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-
         # Check if realm exists
         check_url = f"{self.base_url}/admin/realms/mcp"
-        response = requests.get(check_url, headers=headers)
+        response = self.session.get(check_url)
         if response.status_code == 200:
             print("  Realm 'mcp' already exists, skipping creation")
             return True
@@ -91,7 +100,7 @@ class KeycloakSetup:
             "bruteForceProtected": True
         }
 
-        response = requests.post(url, json=data, headers=headers)
+        response = self.session.post(url, json=data)
         if response.status_code == 201:
             print("✓ Realm 'mcp' created")
             return True
@@ -103,17 +112,14 @@ class KeycloakSetup:
         """Create tools:mom_jokes scope"""
         print("Creating client scope 'tools:mom_jokes'...")
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-
         # Check if scope exists
         check_url = f"{self.base_url}/admin/realms/mcp/client-scopes"
-        response = requests.get(check_url, headers=headers)
+        response = self.session.get(check_url)
         if response.status_code == 200:
             scopes = response.json()
-            if any(scope["name"] == "tools:mom_jokes" for scope in scopes):
+            existing = next((scope for scope in scopes if scope["name"] == "tools:mom_jokes"), None)
+            if existing:
+                self.scope_ids["tools:mom_jokes"] = existing["id"]
                 print("  Scope 'tools:mom_jokes' already exists, skipping creation")
                 return True
 
@@ -128,8 +134,9 @@ class KeycloakSetup:
             }
         }
 
-        response = requests.post(check_url, json=data, headers=headers)
+        response = self.session.post(check_url, json=data)
         if response.status_code == 201:
+            self.scope_ids["tools:mom_jokes"] = response.headers.get("Location", "").split("/")[-1]
             print("✓ Client scope 'tools:mom_jokes' created")
             return True
         else:
@@ -140,20 +147,12 @@ class KeycloakSetup:
         """Create mcp-joke-server client"""
         print("Creating client 'mcp-joke-server'...")
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-
-        # Check if client exists
+        # Check if client exists (filtered server-side by clientId)
         check_url = f"{self.base_url}/admin/realms/mcp/clients"
-        response = requests.get(check_url, headers=headers)
-        if response.status_code == 200:
-            clients = response.json()
-            existing = next((c for c in clients if c["clientId"] == "mcp-joke-server"), None)
-            if existing:
-                print("  Client 'mcp-joke-server' already exists, skipping creation")
-                return True
+        response = self.session.get(check_url, params={"clientId": "mcp-joke-server"})
+        if response.status_code == 200 and response.json():
+            print("  Client 'mcp-joke-server' already exists, skipping creation")
+            return True
 
         # Create client
         data = {
@@ -172,7 +171,7 @@ class KeycloakSetup:
             }
         }
 
-        response = requests.post(check_url, json=data, headers=headers)
+        response = self.session.post(check_url, json=data)
         if response.status_code == 201:
             print("✓ Client 'mcp-joke-server' created")
 
@@ -189,20 +188,12 @@ class KeycloakSetup:
         """Create mcp-inspector client"""
         print("Creating client 'mcp-inspector'...")
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-
-        # Check if client exists
+        # Check if client exists (filtered server-side by clientId)
         check_url = f"{self.base_url}/admin/realms/mcp/clients"
-        response = requests.get(check_url, headers=headers)
-        if response.status_code == 200:
-            clients = response.json()
-            existing = next((c for c in clients if c["clientId"] == "mcp-inspector"), None)
-            if existing:
-                print("  Client 'mcp-inspector' already exists, skipping creation")
-                return True
+        response = self.session.get(check_url, params={"clientId": "mcp-inspector"})
+        if response.status_code == 200 and response.json():
+            print("  Client 'mcp-inspector' already exists, skipping creation")
+            return True
 
         # Create client
         data = {
@@ -226,7 +217,7 @@ class KeycloakSetup:
             ]
         }
 
-        response = requests.post(check_url, json=data, headers=headers)
+        response = self.session.post(check_url, json=data)
         if response.status_code == 201:
             print("✓ Client 'mcp-inspector' created")
 
@@ -241,35 +232,23 @@ class KeycloakSetup:
 
     def _assign_scope_to_client(self, client_id: str, scope_name: str):
         """Assign scope to client"""
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        scope_id = self.scope_ids.get(scope_name)
+        if not scope_id:
+            print(f"  ✗ Scope '{scope_name}' has not been created, cannot assign it")
+            return
 
-        # Get scope ID
-        scopes_url = f"{self.base_url}/admin/realms/mcp/client-scopes"
-        response = requests.get(scopes_url, headers=headers)
-        if response.status_code == 200:
-            scopes = response.json()
-            scope = next((s for s in scopes if s["name"] == scope_name), None)
-            if scope:
-                # Add as optional scope
-                url = f"{self.base_url}/admin/realms/mcp/clients/{client_id}/optional-client-scopes/{scope['id']}"
-                requests.put(url, headers=headers)
-                print(f"  ✓ Assigned scope '{scope_name}' to client")
+        # Add as optional scope
+        url = f"{self.base_url}/admin/realms/mcp/clients/{client_id}/optional-client-scopes/{scope_id}"
+        self.session.put(url)
+        print(f"  ✓ Assigned scope '{scope_name}' to client")
 
     def create_test_user(self) -> bool:
         """Create test user"""
         print("Creating test user...")
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-
         # Check if user exists
         check_url = f"{self.base_url}/admin/realms/mcp/users"
-        response = requests.get(check_url, headers=headers, params={"username": "testuser"})
+        response = self.session.get(check_url, params={"username": "testuser"})
         if response.status_code == 200:
             users = response.json()
             if users:
@@ -291,7 +270,7 @@ class KeycloakSetup:
             }]
         }
 
-        response = requests.post(check_url, json=data, headers=headers)
+        response = self.session.post(check_url, json=data)
         if response.status_code == 201:
             print("✓ User 'testuser' created with password 'testpass'")
             return True
@@ -311,18 +290,22 @@ class KeycloakSetup:
         if not self.get_admin_token():
             return False
 
-        steps = [
-            self.create_realm,
-            self.create_client_scope,
-            self.create_server_client,
-            self.create_inspector_client,
-            self.create_test_user
-        ]
-
-        for step in steps:
-            if not step():
-                print("\n✗ Setup failed")
-                return False
+        if not self.create_realm():
+            print("\n✗ Setup failed")
+            return False
+
+        # Independent steps run concurrently; the clients are created after
+        # the scope because they get it assigned on creation
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stages = [
+                (self.create_client_scope, self.create_test_user),
+                (self.create_server_client, self.create_inspector_client),
+            ]
+            for stage in stages:
+                futures = [executor.submit(step) for step in stage]
+                if not all([future.result() for future in futures]):
+                    print("\n✗ Setup failed")
+                    return False
 
         print("\n" + "="*60)
         print("✓ Keycloak setup completed successfully!")
@@ -5,31 +5,132 @@ Implements Protected Resource Metadata (RFC 9728) and token validation
 for protecting specific MCP tools with OAuth 2.1.
 """
 
+import asyncio
+import base64
+import hashlib
 import os
-from typing import Optional, Dict, Any, List
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Hashable, Callable, Awaitable, TypeVar
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse
-from jose import JWTError, jwt
+import jwt
+from jwt import PyJWK
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
 from pydantic import BaseModel
 import httpx
 import logging
+import msgspec
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _read_env() -> Tuple[str, str, str, bool, str, str, str]:
+    """Read the configuration from environment variables."""
+    return (
+        os.getenv("KEYCLOAK_URL", "http://localhost:8080"),
+        os.getenv("KEYCLOAK_REALM", "mcp"),
+        os.getenv("RESOURCE_SERVER_URL", "http://localhost:8000"),
+        os.getenv("ALLOW_AUTH_BYPASS", "false").lower() == "true",
+        # Token validation mode: "jwks" (local signature check) or "introspection"
+        os.getenv("AUTH_MODE", "jwks").lower(),
+        os.getenv("KEYCLOAK_CLIENT_ID", "mcp-joke-server"),
+        os.getenv("KEYCLOAK_CLIENT_SECRET", ""),
+    )
+
+
+def _derive_urls(
+    keycloak_url: str, realm: str, resource_server_url: str
+) -> Tuple[str, str, str, str, str]:
+    """Build the issuer, JWKS, introspection and metadata URLs and the auth challenge."""
+    issuer = f"{keycloak_url}/realms/{realm}"
+    metadata_url = f"{resource_server_url}/.well-known/oauth-protected-resource"
+    return (
+        issuer,
+        f"{issuer}/protocol/openid-connect/certs",
+        f"{issuer}/protocol/openid-connect/token/introspect",
+        metadata_url,
+        f'Bearer resource_metadata="{metadata_url}"',
+    )
+
+
 # Configuration
-KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
-KEYCLOAK_REALM = os.getenv("KEYCLOAK_REALM", "mcp")
-RESOURCE_SERVER_URL = os.getenv("RESOURCE_SERVER_URL", "http://localhost:8000")
+(
+    KEYCLOAK_URL, KEYCLOAK_REALM, RESOURCE_SERVER_URL, ALLOW_AUTH_BYPASS,
+    AUTH_MODE, KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET,
+) = _read_env()
+
+# Values derived from the configuration
+_ISSUER, _JWKS_URL, _INTROSPECTION_URL, _METADATA_URL, _WWW_AUTH_HEADER = _derive_urls(
+    KEYCLOAK_URL, KEYCLOAK_REALM, RESOURCE_SERVER_URL
+)
+
+# Serialized Protected Resource Metadata, built on first use
+_metadata_json: Optional[bytes] = None
 
 # Tools that require authorization
-PROTECTED_TOOLS = {"get_mom_joke"}
+PROTECTED_TOOLS: frozenset[str] = frozenset({"get_mom_joke"})
+
+# Scope a token must carry to use the protected tools
+_REQUIRED_SCOPE = "tools:mom_jokes"
 
 # Bearer token scheme
 bearer_scheme = HTTPBearer(auto_error=False)
 
+# Shared HTTP client for Keycloak calls (created lazily, reused across requests)
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = asyncio.Lock()
+
+# JWKS cache: JWKS URL -> (expires_at, etag, jwks, signing keys by kid)
+JWKS_CACHE_TTL = 300.0
+_jwks_cache: Dict[str, Tuple[float, str, Dict[str, Any], Dict[str, Any]]] = {}
+_jwks_epoch = 0
+
+# Unknown key IDs force an early JWKS revalidation at most this often
+JWKS_MIN_REFRESH_INTERVAL = 30.0
+_jwks_forced_at = float("-inf")
+
+# In-flight JWKS fetches and token validations, shared by concurrent callers
+_inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+# Validated token cache: (JWKS epoch, token sha256) -> (exp, claims)
+TOKEN_CACHE_SIZE = 10_000
+_token_cache: "OrderedDict[Tuple[int, bytes], Tuple[int, Dict[str, Any]]]" = OrderedDict()
+
+T = TypeVar("T")
+
+
+def reload_config() -> None:
+    """
+    Re-read configuration from environment variables.
+
+    Configuration is read once at import time so request handling doesn't
+    consult os.environ; call this after changing the environment (e.g. in
+    tests) to pick up new values. Cached keys and validated tokens belong
+    to the old configuration and are dropped.
+    """
+    global KEYCLOAK_URL, KEYCLOAK_REALM, RESOURCE_SERVER_URL, ALLOW_AUTH_BYPASS
+    global AUTH_MODE, KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET
+    global _ISSUER, _JWKS_URL, _INTROSPECTION_URL, _METADATA_URL, _WWW_AUTH_HEADER
+    global _metadata_json, _jwks_forced_at
+
+    (
+        KEYCLOAK_URL, KEYCLOAK_REALM, RESOURCE_SERVER_URL, ALLOW_AUTH_BYPASS,
+        AUTH_MODE, KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET,
+    ) = _read_env()
+    _ISSUER, _JWKS_URL, _INTROSPECTION_URL, _METADATA_URL, _WWW_AUTH_HEADER = _derive_urls(
+        KEYCLOAK_URL, KEYCLOAK_REALM, RESOURCE_SERVER_URL
+    )
+    _metadata_json = None
+
+    _jwks_cache.clear()
+    _token_cache.clear()
+    _jwks_forced_at = float("-inf")
+
+
 
 class ProtectedResourceMetadata(BaseModel):
     """Protected Resource Metadata as per RFC 9728."""
@@ -63,16 +164,32 @@ def get_protected_resource_metadata() -> ProtectedResourceMetadata:
     """
     return ProtectedResourceMetadata(
         resource=RESOURCE_SERVER_URL,
-        authorization_servers=[
-            f"{KEYCLOAK_URL}/realms/{KEYCLOAK_REALM}"
-        ],
-        scopes_supported=["tools:mom_jokes"],
+        authorization_servers=[_ISSUER],
+        scopes_supported=[_REQUIRED_SCOPE],
         bearer_methods_supported=["header"],
         resource_name="MCP Joke Server",
         resource_description="MCP server providing joke generation tools with selective authorization"
     )
 
 
+def get_protected_resource_metadata_json() -> bytes:
+    """
+    Get the Protected Resource Metadata serialized as JSON.
+
+    The metadata only depends on configuration, so it is serialized once
+    and reused until reload_config() is called.
+
+    Returns:
+        JSON bytes of the metadata, omitting unset fields
+    """
+    global _metadata_json
+    if _metadata_json is None:
+        _metadata_json = msgspec.json.encode(
+            get_protected_resource_metadata().model_dump(exclude_none=True)
+        )
+    return _metadata_json
+
+
 def create_www_authenticate_header() -> str:
     """
     Create WWW-Authenticate header as per RFC 9728.
@@ -80,38 +197,211 @@ def create_www_authenticate_header() -> str:
     Returns:
         WWW-Authenticate header value with resource_metadata parameter
     """
-    metadata_url = f"{RESOURCE_SERVER_URL}/.well-known/oauth-protected-resource"
-    return f'Bearer resource_metadata="{metadata_url}"'
+    return _WWW_AUTH_HEADER
 
 
-async def get_jwks() -> Dict[str, Any]:
+async def get_http_client() -> httpx.AsyncClient:
     """
-    Fetch JWKS (JSON Web Key Set) from Keycloak.
+    Get the shared HTTP client used for Keycloak requests.
+
+    The client keeps connections alive between calls so token validation
+    does not pay a TCP/TLS handshake on every authenticated request.
 
     Returns:
-        JWKS dictionary containing public keys
+        Long-lived httpx.AsyncClient instance
+    """
+    global _http_client
+
+    if _http_client is None:
+        async with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.AsyncClient(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=20,
+                        max_connections=100,
+                        keepalive_expiry=60.0,
+                    ),
+                    timeout=5.0,
+                )
+
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client, if it has been created."""
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _parse_signing_keys(jwks: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build public key objects from a JWKS, indexed by key ID.
+
+    Constructing the RSA key once per key rotation means token validation
+    only needs a dict lookup instead of re-parsing the JWK on every call.
+    """
+    keys = {}
+    for key_data in jwks.get("keys", []):
+        kid = key_data.get("kid")
+        # Only RS256 tokens are accepted, so only RSA signing keys are useful
+        if not kid or key_data.get("kty") != "RSA" or key_data.get("use", "sig") != "sig":
+            continue
+        try:
+            keys[kid] = PyJWK(key_data, algorithm=key_data.get("alg", "RS256")).key
+        except jwt.PyJWKError as e:
+            logger.warning("Skipping unusable JWKS key %s: %s", kid, e)
+    return keys
+
+
+async def _single_flight(key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run func once for all concurrent callers using the same key.
+
+    The first caller starts the work as a task; everyone arriving before it
+    finishes awaits that same task instead of repeating the work.
+
+    Args:
+        key: Identifies equivalent work
+        func: Coroutine function performing the work
+
+    Returns:
+        The result of the shared call
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(func())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so one cancelled caller doesn't cancel the work for the others
+    return await asyncio.shield(task)
+
+
+async def _get_jwks_entry() -> Tuple[float, str, Dict[str, Any], Dict[str, Any]]:
+    """
+    Get the cached JWKS entry, fetching or revalidating it when expired.
+
+    The key set is cached for JWKS_CACHE_TTL seconds and revalidated with
+    If-None-Match once the entry expires, so signing keys are only
+    downloaded again when Keycloak actually rotates them. Concurrent cache
+    misses share a single request.
+
+    Returns:
+        Tuple of (expires_at, etag, jwks, signing keys by kid)
 
     Raises:
         AuthorizationError if JWKS cannot be fetched
     """
-    jwks_url = f"{KEYCLOAK_URL}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/certs"
+    jwks_url = _JWKS_URL
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(jwks_url, timeout=5.0)
+    cached = _jwks_cache.get(jwks_url)
+    if cached and time.monotonic() < cached[0]:
+        return cached
+
+    return await _single_flight(("jwks", jwks_url), lambda: _fetch_jwks_entry(jwks_url))
 
-            if response.status_code != 200:
-                raise AuthorizationError("Failed to fetch JWKS")
 
-            return response.json()
+async def _fetch_jwks_entry(
+    jwks_url: str
+) -> Tuple[float, str, Dict[str, Any], Dict[str, Any]]:
+    """Fetch (or revalidate) the JWKS and store it in the cache."""
+    global _jwks_epoch
 
+    cached = _jwks_cache.get(jwks_url)
+    now = time.monotonic()
+
+    headers = {}
+    if cached and cached[1]:
+        headers["If-None-Match"] = cached[1]
+
+    try:
+        client = await get_http_client()
+        response = await client.get(jwks_url, headers=headers)
     except httpx.RequestError as e:
-        logger.error(f"Error fetching JWKS from Keycloak: {e}")
-        if os.getenv("ALLOW_AUTH_BYPASS", "false").lower() == "true":
+        logger.error("Error fetching JWKS from Keycloak: %s", e)
+        if ALLOW_AUTH_BYPASS:
             logger.warning("Auth bypass enabled - skipping JWKS fetch")
-            return {"keys": []}
+            return (0.0, "", {"keys": []}, {})
         raise AuthorizationError("Authentication service unavailable")
 
+    if response.status_code == 304 and cached:
+        entry = (now + JWKS_CACHE_TTL, cached[1], cached[2], cached[3])
+    elif response.status_code == 200:
+        jwks = msgspec.json.decode(response.content)
+        signing_keys = _parse_signing_keys(jwks)
+        entry = (
+            now + JWKS_CACHE_TTL,
+            response.headers.get("etag", ""),
+            jwks,
+            signing_keys,
+        )
+        # Keys were added or removed - tokens validated against the old set
+        # must be rechecked
+        if cached is None or signing_keys.keys() != cached[3].keys():
+            _jwks_epoch += 1
+    else:
+        raise AuthorizationError("Failed to fetch JWKS")
+
+    _jwks_cache[jwks_url] = entry
+    return entry
+
+
+async def _refresh_signing_keys() -> Dict[str, Any]:
+    """
+    Revalidate the cached JWKS early after a token named an unknown key ID.
+
+    The cached entry is marked expired but keeps its ETag, so the refetch is
+    a conditional request. Forced refreshes happen at most once every
+    JWKS_MIN_REFRESH_INTERVAL seconds; tokens with made-up key IDs can't
+    make every request go to Keycloak.
+
+    Returns:
+        Dictionary mapping key ID to public key
+
+    Raises:
+        AuthorizationError if JWKS cannot be fetched
+    """
+    global _jwks_forced_at
+
+    cached = _jwks_cache.get(_JWKS_URL)
+    now = time.monotonic()
+    if cached and now - _jwks_forced_at >= JWKS_MIN_REFRESH_INTERVAL:
+        _jwks_forced_at = now
+        _jwks_cache[_JWKS_URL] = (0.0, cached[1], cached[2], cached[3])
+
+    return await get_signing_keys()
+
+
+async def get_jwks() -> Dict[str, Any]:
+    """
+    Fetch JWKS (JSON Web Key Set) from Keycloak.
+
+    Returns:
+        JWKS dictionary containing public keys
+
+    Raises:
+        AuthorizationError if JWKS cannot be fetched
+    """
+    entry = await _get_jwks_entry()
+    return entry[2]
+
+
+async def get_signing_keys() -> Dict[str, Any]:
+    """
+    Get the realm's signing keys as prebuilt public key objects.
+
+    Returns:
+        Dictionary mapping key ID to public key
+
+    Raises:
+        AuthorizationError if JWKS cannot be fetched
+    """
+    entry = await _get_jwks_entry()
+    return entry[3]
+
 
 async def validate_token(token: str) -> Dict[str, Any]:
     """
@@ -119,9 +409,129 @@ async def validate_token(token: str) -> Dict[str, Any]:
 
     This approach validates tokens locally using JWKS instead of introspection,
     which is more efficient and doesn't require special Keycloak permissions.
+    Set AUTH_MODE=introspection to ask Keycloak about every token instead.
+
+    Args:
+        token: The access token to validate
+
+    Returns:
+        Token claims if valid
+
+    Raises:
+        AuthorizationError if token is invalid
+    """
+    if ALLOW_AUTH_BYPASS:
+        # Development mode - don't contact Keycloak at all
+        return {"sub": "dev-user", "scope": _REQUIRED_SCOPE, "active": True}
+
+    if AUTH_MODE == "introspection":
+        return await _validate_via_introspection(token)
+
+    # Tokens are re-presented on every tool call, so reuse earlier results
+    # for as long as the token (and the key set that verified it) is valid
+    fingerprint = (_jwks_epoch, hashlib.sha256(token.encode()).digest())
+    cached = _token_cache.get(fingerprint)
+    if cached and cached[0] > time.time() + 5:
+        _token_cache.move_to_end(fingerprint)
+        return cached[1]
+
+    # Identical tokens arriving together are verified once
+    return await _single_flight(
+        ("token", fingerprint[1]), lambda: _verify_token(token, fingerprint[1])
+    )
+
+
+async def _validate_via_introspection(token: str) -> Dict[str, Any]:
+    """
+    Validate OAuth token using Keycloak token introspection (RFC 7662).
+
+    Requires the credentials of a confidential client allowed to introspect
+    tokens (KEYCLOAK_CLIENT_ID / KEYCLOAK_CLIENT_SECRET).
+
+    Args:
+        token: The access token to validate
+
+    Returns:
+        Introspection response if the token is active
+
+    Raises:
+        AuthorizationError if token is invalid
+    """
+    try:
+        client = await get_http_client()
+        response = await client.post(
+            _INTROSPECTION_URL,
+            data={"token": token, "token_type_hint": "access_token"},
+            auth=(KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET),
+        )
+    except httpx.RequestError as e:
+        logger.error("Error introspecting token with Keycloak: %s", e)
+        raise AuthorizationError("Authentication service unavailable")
+
+    if response.status_code != 200:
+        logger.error("Token introspection failed: %s", response.status_code)
+        raise AuthorizationError("Token validation failed")
+
+    token_info = response.json()
+    if not token_info.get("active", False):
+        logger.warning("Token is not active")
+        raise AuthorizationError("Token is not active")
+
+    logger.info("Token introspected successfully for subject: %s", token_info.get("sub"))
+    return token_info
+
+
+def _b64url_decode(segment: str) -> bytes:
+    """Decode an unpadded base64url JWT segment."""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _decode_segment(segment: str) -> Dict[str, Any]:
+    """Decode a JWT header or payload segment into a dict."""
+    try:
+        value = msgspec.json.decode(_b64url_decode(segment))
+    except ValueError as e:
+        raise jwt.DecodeError(f"Invalid token segment: {e}")
+    if not isinstance(value, dict):
+        raise jwt.DecodeError("Invalid token segment: not a JSON object")
+    return value
+
+
+def _check_claims(claims: Dict[str, Any], issuer: str) -> None:
+    """
+    Check the time-based and issuer claims of a verified token.
+
+    Raises:
+        The matching jwt exception when a claim is invalid
+    """
+    now = time.time()
+
+    for name in ("exp", "nbf", "iat"):
+        if name in claims and not isinstance(claims[name], (int, float)):
+            if name == "iat":
+                raise jwt.InvalidIssuedAtError("Issued At claim (iat) must be a number")
+            raise jwt.DecodeError(f"{name} claim must be a number")
+
+    if "exp" in claims and claims["exp"] <= now:
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    if "nbf" in claims and claims["nbf"] > now:
+        raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+    if "iat" in claims and claims["iat"] > now:
+        raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+
+    if "iss" not in claims:
+        raise jwt.MissingRequiredClaimError("iss")
+    if claims["iss"] != issuer:
+        raise jwt.InvalidIssuerError("Invalid issuer")
+
+
+async def _verify_token(token: str, digest: bytes) -> Dict[str, Any]:
+    """
+    Verify a token's signature and claims against the realm's JWKS.
 
     Args:
         token: The access token to validate
+        digest: SHA-256 digest of the token, used as its cache key
 
     Returns:
         Token claims if valid
@@ -130,47 +540,55 @@ async def validate_token(token: str) -> Dict[str, Any]:
         AuthorizationError if token is invalid
     """
     try:
-        # Get JWKS for signature verification
-        jwks = await get_jwks()
+        # Get signing keys for signature verification
+        signing_keys = await get_signing_keys()
 
-        logger.info(f"Validating token (length: {len(token)}, preview: {token[:50]}...)")
+        logger.info("Validating token (length: %d, preview: %s...)", len(token), token[:50])
+
+        # Split the token once; header, payload and signature are each
+        # decoded a single time below
+        parts = token.split(".")
+        if len(parts) != 3:
+            raise jwt.DecodeError("Not enough segments")
+        header_b64, payload_b64, signature_b64 = parts
 
         # Decode JWT header to get key ID
-        unverified_header = jwt.get_unverified_header(token)
+        unverified_header = _decode_segment(header_b64)
+        if unverified_header.get("alg") != "RS256":
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+
         kid = unverified_header.get("kid")
-        logger.info(f"Token key ID: {kid}")
+        logger.info("Token key ID: %s", kid)
 
         if not kid:
             raise AuthorizationError("Token missing key ID")
 
         # Find the matching key in JWKS
-        key = None
-        for jwk in jwks.get("keys", []):
-            if jwk.get("kid") == kid:
-                key = jwk
-                break
+        key = signing_keys.get(kid)
 
-        if not key:
+        if key is None:
+            # Unknown key ID - Keycloak may have rotated its keys, so
+            # revalidate the cached JWKS and retry once
+            key = (await _refresh_signing_keys()).get(kid)
+
+        if key is None:
             raise AuthorizationError("No matching key found in JWKS")
 
-        # Verify and decode the token
-        # The jose library handles RSA signature verification using the JWK
-        issuer = f"{KEYCLOAK_URL}/realms/{KEYCLOAK_REALM}"
-
-        claims = jwt.decode(
-            token,
-            key,
-            algorithms=["RS256"],
-            issuer=issuer,
-            options={
-                "verify_signature": True,
-                "verify_aud": False,  # We'll validate audience manually
-                "verify_iat": True,
-                "verify_exp": True,
-                "verify_nbf": True,
-                "verify_iss": True,
-            }
-        )
+        # Verify the RS256 signature over "<header>.<payload>" with the
+        # prebuilt public key
+        try:
+            key.verify(
+                _b64url_decode(signature_b64),
+                f"{header_b64}.{payload_b64}".encode(),
+                padding.PKCS1v15(),
+                hashes.SHA256(),
+            )
+        except InvalidSignature:
+            raise jwt.InvalidSignatureError("Signature verification failed")
+
+        # Audience is validated manually below
+        claims = _decode_segment(payload_b64)
+        _check_claims(claims, _ISSUER)
 
         # Validate audience if present
         audience = claims.get("aud", [])
@@ -180,28 +598,63 @@ async def validate_token(token: str) -> Dict[str, Any]:
         # Log for debugging but don't fail on audience mismatch
         # In a production setup, you'd want stricter validation
         if audience and RESOURCE_SERVER_URL not in audience and "account" not in audience:
-            logger.warning(f"Token audience: {audience}. Expected {RESOURCE_SERVER_URL}")
+            logger.warning("Token audience: %s. Expected %s", audience, RESOURCE_SERVER_URL)
+
+        logger.info("Token validated successfully for subject: %s", claims.get("sub"))
+
+        exp = claims.get("exp")
+        if isinstance(exp, int):
+            _token_cache[(_jwks_epoch, digest)] = (exp, claims)
+            if len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
 
-        logger.info(f"Token validated successfully for subject: {claims.get('sub')}")
         return claims
 
     except jwt.ExpiredSignatureError:
         logger.warning("Token has expired")
         raise AuthorizationError("Token has expired")
-    except jwt.JWTClaimsError as e:
-        logger.warning(f"Token claims validation failed: {e}")
+    except (
+        jwt.InvalidIssuerError,
+        jwt.ImmatureSignatureError,
+        jwt.InvalidIssuedAtError,
+        jwt.MissingRequiredClaimError,
+    ) as e:
+        logger.warning("Token claims validation failed: %s", e)
         raise AuthorizationError("Invalid token claims")
-    except JWTError as e:
-        logger.error(f"JWT validation error: {e}")
+    except jwt.InvalidTokenError as e:
+        logger.error("JWT validation error: %s", e)
         raise AuthorizationError("Invalid token")
     except Exception as e:
-        logger.error(f"Unexpected error validating token: {e}")
-        if os.getenv("ALLOW_AUTH_BYPASS", "false").lower() == "true":
-            logger.warning("Auth bypass enabled - skipping token validation")
-            return {"sub": "dev-user", "scope": "tools:mom_jokes"}
+        logger.error("Unexpected error validating token: %s", e)
         raise AuthorizationError("Token validation failed")
 
 
+def _has_scope(scope_str: str, needed: str = _REQUIRED_SCOPE) -> bool:
+    """
+    Check whether a space-delimited scope string contains a scope.
+
+    Scans the string in place rather than splitting it into a list.
+
+    Args:
+        scope_str: The token's "scope" claim
+        needed: The scope to look for
+
+    Returns:
+        True if needed appears as a whole scope in scope_str
+    """
+    idx = 0
+    n = len(needed)
+    while True:
+        i = scope_str.find(needed, idx)
+        if i < 0:
+            return False
+        left_ok = i == 0 or scope_str[i - 1].isspace()
+        right_ok = i + n == len(scope_str) or scope_str[i + n].isspace()
+        if left_ok and right_ok:
+            return True
+        idx = i + n
+
+
 def requires_authorization(tool_name: str) -> bool:
     """
     Check if a tool requires authorization.
@@ -211,6 +664,10 @@ def requires_authorization(tool_name: str) -> bool:
 
     Returns:
         True if the tool requires authorization, False otherwise
+
+    Note:
+        Hot paths in this module test ``tool_name in PROTECTED_TOOLS``
+        directly; this wrapper is kept for callers of the public API.
     """
     return tool_name in PROTECTED_TOOLS
 
@@ -232,49 +689,95 @@ async def check_tool_authorization(
     Raises:
         AuthorizationError if authorization is required but failed
     """
-    if not requires_authorization(tool_name):
+    if tool_name not in PROTECTED_TOOLS:
         # Tool doesn't require authorization
         return None
 
     # Check for development bypass
-    if os.getenv("ALLOW_AUTH_BYPASS", "false").lower() == "true":
-        logger.warning(f"Auth bypass enabled - allowing access to {tool_name}")
-        return {"active": True, "sub": "dev-user", "scope": "tools:mom_jokes"}
+    if ALLOW_AUTH_BYPASS:
+        logger.warning("Auth bypass enabled - allowing access to %s", tool_name)
+        return {"active": True, "sub": "dev-user", "scope": _REQUIRED_SCOPE}
 
     # Tool requires authorization
     if not credentials:
-        headers = {"WWW-Authenticate": create_www_authenticate_header()}
+        headers = {"WWW-Authenticate": _WWW_AUTH_HEADER}
         raise AuthorizationError("Authorization required", headers=headers)
 
     # Validate the token
     # Strip any whitespace that might have been added
     token = credentials.credentials.strip()
-    logger.info(f"Received token for validation (type: {type(token)}, length: {len(token)})")
+    logger.info("Received token for validation (type: %s, length: %d)", type(token), len(token))
     token_info = await validate_token(token)
 
     # Check if token has required scope
-    scopes = token_info.get("scope", "").split()
-    required_scope = "tools:mom_jokes"
+    scope = token_info.get("scope", "")
 
-    if required_scope not in scopes:
-        logger.warning(f"Token missing required scope {required_scope}. Has scopes: {scopes}")
+    if not _has_scope(scope):
+        logger.warning("Token missing required scope %s. Has scopes: %s", _REQUIRED_SCOPE, scope)
         raise AuthorizationError("Insufficient scope")
 
     return token_info
 
 
+async def check_tools_authorization(
+    tool_names: List[str],
+    credentials: Optional[HTTPAuthorizationCredentials] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Check authorization for several tools with a single token validation.
+
+    All protected tools share the same scope, so the token and scope are
+    checked once and the result is reused for every protected tool.
+
+    Args:
+        tool_names: Names of the tools being accessed
+        credentials: Optional bearer token credentials
+
+    Returns:
+        Per-tool results in input order: token claims for protected tools,
+        None for tools that don't require auth
+
+    Raises:
+        AuthorizationError if any tool requires authorization and it failed
+    """
+    needs_auth = [name in PROTECTED_TOOLS for name in tool_names]
+    if not any(needs_auth):
+        return [None] * len(tool_names)
+
+    protected_tool = tool_names[needs_auth.index(True)]
+    token_info = await check_tool_authorization(protected_tool, credentials)
+
+    return [token_info if needed else None for needed in needs_auth]
+
+
 class AuthorizationMiddleware:
     """
     Middleware to handle authorization for MCP requests.
+
+    Requests outside the protected path prefixes are passed straight
+    through. For matching requests the bearer token, if present, is read
+    from the raw ASGI headers and stored in scope["state"]["bearer_token"].
     """
 
-    def __init__(self, app):
+    def __init__(self, app, protected_prefixes: Tuple[bytes, ...] = (b"/mcp",)):
         self.app = app
+        self._protected_prefixes = protected_prefixes
 
     async def __call__(self, scope, receive, send):
-        if scope["type"] == "http":
-            # Check if this is an MCP tool call that needs authorization
-            # This will be integrated into the actual request handling
-            pass
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        raw_path = scope.get("raw_path") or scope["path"].encode()
+        if not raw_path.startswith(self._protected_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_scheme, _, token = value.partition(b" ")
+                if auth_scheme.lower() == b"bearer" and token.strip():
+                    scope.setdefault("state", {})["bearer_token"] = token.strip().decode("latin-1")
+                break
 
-        await self.app(scope, receive, send)
\ No newline at end of file
+        await self.app(scope, receive, send)
@@ -5,43 +5,53 @@ This module provides a Streamable HTTP transport layer for the MCP server,
 enabling web-based clients to interact with the joke generation tools.
 """
 
+import os
 import sys
+import queue
+import random
+import functools
 import logging
+import logging.handlers
 from contextlib import asynccontextmanager
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional, Union
 
+import msgspec
 import uvicorn
-
-logger = logging.getLogger(__name__)
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import Response
+from fastapi.security import HTTPAuthorizationCredentials
 
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
-from .jokes import JokeGenerator
+from .jokes import DAD_JOKES, MOM_JOKES
 from .auth import (
-    get_protected_resource_metadata,
+    get_protected_resource_metadata_json,
     check_tool_authorization,
+    check_tools_authorization,
     requires_authorization,
     AuthorizationError,
-    bearer_scheme
+    PROTECTED_TOOLS,
+    ALLOW_AUTH_BYPASS,
+    bearer_scheme,
+    close_http_client,
 )
 
+logger = logging.getLogger(__name__)
 
-# Initialize joke generator
-joke_gen = JokeGenerator()
+# Tool name -> joke function. The HTTP path picks from the joke lists
+# directly with the module-level random instance rather than going through
+# a JokeGenerator, saving a Python frame per call.
+_TOOL_IMPL = {
+    "get_dad_joke": functools.partial(random.choice, DAD_JOKES),
+    "get_mom_joke": functools.partial(random.choice, MOM_JOKES),
+}
 
 # Create MCP server instance
 mcp_server = Server("joke-server-http")
 
 
-# Store active sessions
-sessions: dict[str, dict[str, Any]] = {}
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -50,10 +60,11 @@ async def lifespan(app: FastAPI):
     Handles server startup and shutdown.
     """
     # Startup
-    sys.stderr.write("Starting HTTP MCP server...\n")
+    logger.info("Starting HTTP MCP server...")
     yield
     # Shutdown
-    sys.stderr.write("Shutting down HTTP MCP server...\n")
+    logger.info("Shutting down HTTP MCP server...")
+    await close_http_client()
 
 
 # Create FastAPI application
@@ -66,8 +77,6 @@ app = FastAPI(
 
 # Configure CORS to allow MCP Inspector and other clients
 # In production, be more restrictive with allowed origins
-import os
-
 cors_origins = [
     "http://localhost:6274",    # MCP Inspector default port
     "http://localhost:3000",    # Common dev server port
@@ -76,7 +85,7 @@ cors_origins = [
 ]
 
 # Allow all origins in development mode
-if os.getenv("ALLOW_AUTH_BYPASS", "false").lower() == "true":
+if ALLOW_AUTH_BYPASS:
     cors_origins = ["*"]  # Allow all origins in dev mode
 
 app.add_middleware(
@@ -89,42 +98,52 @@ app.add_middleware(
 )
 
 
-@mcp_server.list_tools()
-async def list_tools() -> list[Tool]:
+_TOOL_DICTS: tuple[dict, ...] = (
+    {
+        "name": "get_dad_joke",
+        "description": "Get a random dad joke. Dad jokes are known for being cheesy, "
+        "corny, and often involving puns or wordplay. Perfect for groans and eye rolls!",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    },
+    {
+        "name": "get_mom_joke",
+        "description": "Get a random mom joke. These are classic sayings and phrases "
+        "that mothers often use. Nostalgic and relatable!",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    },
+)
+
+# The tool definitions never change, so the tools/list payloads are built
+# once here as plain dicts; Tool models are only created for the MCP SDK.
+# Every protected tool shares one scope, so an authorized caller always sees
+# the full list.
+_PUBLIC_TOOL_DICTS = [t for t in _TOOL_DICTS if not requires_authorization(t["name"])]
+_PROTECTED_TOOL_DICTS = [t for t in _TOOL_DICTS if requires_authorization(t["name"])]
+_AUTHORIZED_TOOL_DICTS = _PUBLIC_TOOL_DICTS + _PROTECTED_TOOL_DICTS
+_PROTECTED_TOOL_NAMES = [t["name"] for t in _PROTECTED_TOOL_DICTS]
+
+
+def _list_tools_sync() -> list[Tool]:
     """
     List available tools.
 
     Returns:
         List of Tool objects describing available joke generators
     """
-    return [
-        Tool(
-            name="get_dad_joke",
-            description="Get a random dad joke. Dad jokes are known for being cheesy, "
-            "corny, and often involving puns or wordplay. Perfect for groans and eye rolls!",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
-            },
-        ),
-        Tool(
-            name="get_mom_joke",
-            description="Get a random mom joke. These are classic sayings and phrases "
-            "that mothers often use. Nostalgic and relatable!",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
-            },
-        ),
-    ]
+    return [Tool(**d) for d in _TOOL_DICTS]
 
 
-@mcp_server.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+def _call_tool_sync(name: str, arguments: Any) -> list[TextContent]:
     """
-    Handle tool execution requests.
+    Execute a tool.
 
     Args:
         name: Name of the tool to execute
@@ -136,34 +155,49 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     Raises:
         ValueError: If tool name is not recognized
     """
-    if name == "get_dad_joke":
-        joke = joke_gen.get_dad_joke()
-        return [TextContent(type="text", text=joke)]
-    elif name == "get_mom_joke":
-        joke = joke_gen.get_mom_joke()
-        return [TextContent(type="text", text=joke)]
-    else:
+    fn = _TOOL_IMPL.get(name)
+    if fn is None:
         raise ValueError(f"Unknown tool: {name}")
+    return [TextContent(type="text", text=fn())]
+
+
+# The MCP SDK needs coroutine handlers; the HTTP path calls the sync versions
+# directly so it doesn't create a coroutine per request.
+@mcp_server.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available tools for the MCP SDK."""
+    return _list_tools_sync()
+
+
+@mcp_server.call_tool()
+async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Handle tool execution requests for the MCP SDK."""
+    return _call_tool_sync(name, arguments)
+
+
+# The informational endpoints return constant bodies, serialized once here
+_ROOT_BYTES = msgspec.json.encode({
+    "name": "Joke MCP Server",
+    "version": "0.1.0",
+    "description": "MCP server providing dad and mom joke generation tools",
+    "transport": "streamable-http",
+    "endpoints": {
+        "mcp": "/mcp",
+    },
+})
+_HEALTH_BYTES = b'{"status":"healthy"}'
 
 
 @app.get("/")
 async def root():
     """Root endpoint providing server information."""
-    return {
-        "name": "Joke MCP Server",
-        "version": "0.1.0",
-        "description": "MCP server providing dad and mom joke generation tools",
-        "transport": "streamable-http",
-        "endpoints": {
-            "mcp": "/mcp",
-        },
-    }
+    return Response(content=_ROOT_BYTES, media_type="application/json")
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
 @app.get("/.well-known/oauth-protected-resource")
@@ -173,138 +207,286 @@ async def protected_resource_metadata():
 
     Returns metadata about this resource server and its authorization requirements.
     """
-    metadata = get_protected_resource_metadata()
-    return JSONResponse(content=metadata.model_dump(exclude_none=True))
+    return Response(
+        content=get_protected_resource_metadata_json(), media_type="application/json"
+    )
+
+
+class JsonRpcRequest(msgspec.Struct):
+    """A JSON-RPC 2.0 request received on the /mcp endpoint."""
+
+    jsonrpc: str = "2.0"
+    id: Union[int, float, str, None] = None
+    method: Optional[str] = None
+    params: dict[str, Any] = msgspec.field(default_factory=dict)
+
+
+class JsonRpcResponse(msgspec.Struct, kw_only=True):
+    """A JSON-RPC 2.0 response; exactly one of result or error is set."""
+
+    jsonrpc: str = "2.0"
+    id: Union[int, float, str, None]
+    result: Any = msgspec.UNSET
+    error: Any = msgspec.UNSET
+
+
+# Shared codec instances; a body is either a single request or a batch
+_REQ_DECODER = msgspec.json.Decoder(Union[JsonRpcRequest, list[Any]])
+_RESP_ENCODER = msgspec.json.Encoder()
+
+
+def _result_response(message: JsonRpcRequest, result: Any) -> Response:
+    """Build a JSON-RPC result response for a message."""
+    return Response(
+        content=_RESP_ENCODER.encode(JsonRpcResponse(id=message.id, result=result)),
+        media_type="application/json",
+    )
+
+
+def _error_response(
+    message: Optional[JsonRpcRequest],
+    code: int,
+    text: str,
+    status_code: int,
+    headers: Optional[dict] = None
+) -> Response:
+    """Build a JSON-RPC error response for a message."""
+    return Response(
+        content=_RESP_ENCODER.encode(JsonRpcResponse(
+            id=message.id if message is not None else None,
+            error={
+                "code": code,
+                "message": text,
+            },
+        )),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+async def _handle_tools_list(
+    message: JsonRpcRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = None,
+    authorized: Optional[bool] = None
+) -> Response:
+    """
+    Return the tools the caller is allowed to see.
 
+    authorized carries the result of a check already made for these
+    credentials (as in a batch); None means check them here.
+    """
+    logger.info("tools/list called with credentials: %s", bool(credentials))
+    if not credentials:
+        logger.info("No credentials provided, skipping protected tools")
+        accessible_tools = _PUBLIC_TOOL_DICTS
+    elif authorized is not None:
+        accessible_tools = _AUTHORIZED_TOOL_DICTS if authorized else _PUBLIC_TOOL_DICTS
+    else:
+        try:
+            # One token validation covers every protected tool
+            await check_tools_authorization(_PROTECTED_TOOL_NAMES, credentials)
+            accessible_tools = _AUTHORIZED_TOOL_DICTS
+        except AuthorizationError as e:
+            # User is authenticated but lacks required scope
+            logger.info("Authorization failed for protected tools: %s", e)
+            accessible_tools = _PUBLIC_TOOL_DICTS
 
+    return _result_response(message, {"tools": accessible_tools})
+
+
+async def _handle_tools_call(
+    message: JsonRpcRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = None,
+    authorized: Optional[bool] = None
+) -> Response:
+    """
+    Run a tool after checking the caller may use it.
+
+    authorized carries the result of a check already made for these
+    credentials (as in a batch); None means check them here.
+    """
+    tool_name = message.params.get("name")
+    arguments = message.params.get("arguments", {})
+
+    # Check authorization for protected tools
+    if not authorized:
+        try:
+            await check_tool_authorization(tool_name, credentials)
+        except AuthorizationError as e:
+            return _error_response(
+                message, -32603, str(e.detail), e.status_code, e.headers
+            )
+
+    result = _call_tool_sync(tool_name, arguments)
+    if len(result) == 1 and result[0].type == "text":
+        # Every joke tool returns exactly one text item
+        content = [{"type": "text", "text": result[0].text}]
+    else:
+        content = [{"type": r.type, "text": r.text} for r in result]
+
+    return _result_response(message, {"content": content})
+
+
+# Constant parts of the initialize and method-not-found bodies, serialized once.
+# Only the request id (and the method name for errors) is spliced in per call.
+_INIT_TEMPLATE_PREFIX = b'{"jsonrpc":"2.0","id":'
+_INIT_TEMPLATE_SUFFIX = b',"result":' + msgspec.json.encode({
+    "protocolVersion": "2024-11-05",
+    "capabilities": {"tools": {}},
+    "serverInfo": {
+        "name": "joke-server-http",
+        "version": "0.1.0",
+    },
+}) + b"}"
+_NOT_FOUND_TEMPLATE_MIDDLE = b',"error":{"code":-32601,"message":'
+_NOT_FOUND_TEMPLATE_SUFFIX = b"}}"
+
+
+async def _handle_initialize(
+    message: JsonRpcRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = None,
+    authorized: Optional[bool] = None
+) -> Response:
+    """Answer the MCP initialize handshake."""
+    return Response(
+        content=(
+            _INIT_TEMPLATE_PREFIX
+            + _RESP_ENCODER.encode(message.id)
+            + _INIT_TEMPLATE_SUFFIX
+        ),
+        media_type="application/json",
+    )
+
+
+def _method_not_found(message: JsonRpcRequest) -> Response:
+    """Build the error response for an unknown method."""
+    return Response(
+        content=(
+            _INIT_TEMPLATE_PREFIX
+            + _RESP_ENCODER.encode(message.id)
+            + _NOT_FOUND_TEMPLATE_MIDDLE
+            + _RESP_ENCODER.encode(f"Method not found: {message.method}")
+            + _NOT_FOUND_TEMPLATE_SUFFIX
+        ),
+        status_code=400,
+        media_type="application/json",
+    )
+
+
+_DISPATCH: dict[str, Callable[..., Awaitable[Response]]] = {
+    "tools/list": _handle_tools_list,
+    "tools/call": _handle_tools_call,
+    "initialize": _handle_initialize,
+}
 
 
 async def _handle_mcp_message(
-    message: dict,
-    credentials: Optional[HTTPAuthorizationCredentials] = None
-) -> JSONResponse:
+    message: JsonRpcRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = None,
+    authorized: Optional[bool] = None
+) -> Response:
     """
     Internal handler for MCP protocol messages.
 
     Args:
         message: The JSON-RPC message to handle
         credentials: Optional bearer token credentials
+        authorized: Result of an authorization check already made for the
+            credentials, or None to check them per message
 
     Returns:
-        JSONResponse with the result or error
+        Response with the result or error
     """
-    method = message.get("method")
-
-    if method == "tools/list":
-        tools = await list_tools()
-        logger.info(f"tools/list called with credentials: {bool(credentials)}")
-        # Filter tools based on authorization status
-        accessible_tools = []
-        for tool in tools:
-            # Check if tool requires authorization
-            if requires_authorization(tool.name):
-                # Only include protected tools if user is authenticated
-                if credentials:
-                    try:
-                        # Validate token to check if user has access
-                        # This will check the token and scopes
-                        logger.info(f"Checking authorization for protected tool: {tool.name}")
-                        await check_tool_authorization(tool.name, credentials)
-                        # User is authorized, include the tool
-                        logger.info(f"User authorized for tool: {tool.name}")
-                        accessible_tools.append({
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema,
-                        })
-                    except AuthorizationError as e:
-                        # User is authenticated but lacks required scope
-                        # Don't include this tool
-                        logger.info(f"Authorization failed for {tool.name}: {e}")
-                        pass
-                else:
-                    logger.info(f"No credentials provided, skipping protected tool: {tool.name}")
-                # If no credentials, don't include protected tools
-            else:
-                # Public tool, always include
-                accessible_tools.append({
-                    "name": tool.name,
-                    "description": tool.description,
-                    "inputSchema": tool.inputSchema,
-                })
-
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0",
-                "id": message.get("id"),
-                "result": {
-                    "tools": accessible_tools
-                },
-            }
-        )
+    handler = _DISPATCH.get(message.method)
+    if handler is None:
+        return _method_not_found(message)
+    return await handler(message, credentials, authorized)
+
+
+async def _handle_mcp_batch(
+    messages: list,
+    credentials: Optional[HTTPAuthorizationCredentials] = None
+) -> Response:
+    """
+    Handle a JSON-RPC batch of MCP messages.
+
+    Authorization for the whole batch is checked up front with a single
+    token validation, and the result is handed to every message handler.
+    If a protected call is rejected, the batch is answered with the
+    authorization error's status code and WWW-Authenticate header.
 
-    elif method == "tools/call":
-        params = message.get("params", {})
-        tool_name = params.get("name")
-        arguments = params.get("arguments", {})
+    Args:
+        messages: The decoded JSON-RPC messages in the batch
+        credentials: Optional bearer token credentials
+
+    Returns:
+        Response with a JSON array holding one result or error per message
+    """
+    if not messages:
+        return _error_response(None, -32600, "Invalid request: empty batch", 400)
 
-        # Check authorization for protected tools
+    requests: list[Optional[JsonRpcRequest]] = []
+    tool_names: list[str] = []
+    for raw in messages:
         try:
-            await check_tool_authorization(tool_name, credentials)
-        except AuthorizationError as e:
-            return JSONResponse(
-                content={
-                    "jsonrpc": "2.0",
-                    "id": message.get("id"),
-                    "error": {
-                        "code": -32603,
-                        "message": str(e.detail),
-                    },
-                },
-                status_code=e.status_code,
-                headers=e.headers
-            )
+            message = msgspec.convert(raw, JsonRpcRequest)
+        except msgspec.ValidationError:
+            message = None
+        else:
+            if message.method == "tools/call":
+                name = message.params.get("name")
+                if isinstance(name, str):
+                    tool_names.append(name)
+                else:
+                    # Only this entry is invalid; the rest of the batch still runs
+                    message = None
+        requests.append(message)
 
-        result = await call_tool(tool_name, arguments)
+    if credentials and any(r is not None and r.method == "tools/list" for r in requests):
+        # tools/list shows the protected tools only to authorized callers
+        tool_names.extend(_PROTECTED_TOOL_NAMES)
 
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0",
-                "id": message.get("id"),
-                "result": {
-                    "content": [{"type": r.type, "text": r.text} for r in result]
-                },
-            }
-        )
+    auth_error: Optional[AuthorizationError] = None
+    try:
+        await check_tools_authorization(tool_names, credentials)
+    except AuthorizationError as e:
+        auth_error = e
+    authorized = auth_error is None
+
+    responses = []
+    rejected = False
+    for message in requests:
+        if message is None:
+            responses.append(_error_response(None, -32600, "Invalid request", 400))
+            continue
+
+        if (
+            auth_error is not None
+            and message.method == "tools/call"
+            and message.params["name"] in PROTECTED_TOOLS
+        ):
+            responses.append(_error_response(
+                message, -32603, str(auth_error.detail),
+                auth_error.status_code, auth_error.headers
+            ))
+            rejected = True
+            continue
 
-    elif method == "initialize":
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0",
-                "id": message.get("id"),
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {"tools": {}},
-                    "serverInfo": {
-                        "name": "joke-server-http",
-                        "version": "0.1.0",
-                    },
-                },
-            }
-        )
+        try:
+            responses.append(await _handle_mcp_message(message, credentials, authorized))
+        except Exception as e:
+            logger.exception("Error handling MCP message")
+            responses.append(
+                _error_response(message, -32603, f"Internal error: {str(e)}", 500)
+            )
 
-    else:
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0",
-                "id": message.get("id"),
-                "error": {
-                    "code": -32601,
-                    "message": f"Method not found: {method}",
-                },
-            },
-            status_code=400,
-        )
+    return Response(
+        content=b"[" + b",".join(r.body for r in responses) + b"]",
+        status_code=auth_error.status_code if rejected else 200,
+        headers=auth_error.headers if rejected else None,
+        media_type="application/json",
+    )
 
 
 @app.post("/mcp")
@@ -318,47 +500,75 @@ async def handle_mcp_endpoint(
     This is the primary endpoint that MCP Inspector and other clients use.
     Processes JSON-RPC messages according to the MCP protocol.
     """
+    message = None
     try:
-        message = await request.json()
+        message = _REQ_DECODER.decode(await request.body())
+        if isinstance(message, list):
+            return await _handle_mcp_batch(message, credentials)
         return await _handle_mcp_message(message, credentials)
     except AuthorizationError as e:
         # Authorization errors should be handled with proper headers
-        return JSONResponse(
-            content={
-                "jsonrpc": "2.0",
-                "id": message.get("id") if "message" in locals() else None,
-                "error": {
-                    "code": -32603,
-                    "message": str(e.detail),
-                },
-            },
-            status_code=e.status_code,
-            headers=e.headers
+        return _error_response(
+            message, -32603, str(e.detail), e.status_code, e.headers
         )
+    except msgspec.ValidationError as e:
+        # Valid JSON that is not a JSON-RPC request object
+        return _error_response(None, -32600, f"Invalid request: {e}", 400)
     except Exception as e:
-        sys.stderr.write(f"Error handling MCP message: {e}\n")
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0",
-                "id": message.get("id") if "message" in locals() else None,
-                "error": {"code": -32603, "message": f"Internal error: {str(e)}"},
-            },
-            status_code=500,
+        logger.exception("Error handling MCP message")
+        return _error_response(
+            message if isinstance(message, JsonRpcRequest) else None,
+            -32603, f"Internal error: {str(e)}", 500
         )
 
 
-
-
-def main(host: str = "127.0.0.1", port: int = 8000) -> None:
+def main(host: str = "127.0.0.1", port: int = 8000, workers: Optional[int] = None) -> None:
     """
     Start the HTTP MCP server.
 
     Args:
         host: Host to bind to (default: 127.0.0.1)
         port: Port to bind to (default: 8000)
+        workers: Number of worker processes (default: WEB_CONCURRENCY,
+            or 1 if unset)
     """
-    sys.stderr.write(f"Starting HTTP MCP server on {host}:{port}\n")
-    uvicorn.run(app, host=host, port=port, log_level="info")
+    # Records are queued on the request path and written to stderr by a
+    # background listener thread
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    # Only the stream handler formats; basicConfig would also give the
+    # queue handler a formatter and prefix every line twice
+    logging.root.addHandler(logging.handlers.QueueHandler(log_queue))
+    logging.root.setLevel(logging.INFO)
+    listener.start()
+
+    if workers is None:
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    log_config: dict[str, Any] = uvicorn.config.LOGGING_CONFIG
+    if workers > 1:
+        # Spawned workers don't inherit the handlers above; uvicorn applies
+        # log_config in each worker, so give their root logger a handler
+        log_config = {**log_config, "root": {"handlers": ["default"], "level": "INFO"}}
+
+    logger.info("Starting HTTP MCP server on %s:%d with %d worker(s)", host, port, workers)
+    try:
+        uvicorn.run(
+            # Worker processes import the app themselves, which needs an import string
+            "joke_mcp_server.http_server:app" if workers > 1 else app,
+            host=host,
+            port=port,
+            workers=workers,
+            # uvloop has no Windows support (uvicorn[standard] skips it there)
+            loop="asyncio" if sys.platform == "win32" else "uvloop",
+            http="httptools",
+            log_config=log_config,
+            log_level="info",
+        )
+    finally:
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -52,6 +52,10 @@ class JokeGenerator:
             seed: Optional random seed for reproducible joke selection
         """
         self._random = random.Random(seed)
+        # Bound once so each pick skips the attribute lookups on self._random
+        self._choice = self._random.choice
+        self._dad = DAD_JOKES
+        self._mom = MOM_JOKES
 
     def get_dad_joke(self) -> str:
         """
@@ -60,7 +64,7 @@ class JokeGenerator:
         Returns:
             A string containing a dad joke
         """
-        return self._random.choice(DAD_JOKES)
+        return self._choice(self._dad)
 
     def get_mom_joke(self) -> str:
         """
@@ -69,7 +73,7 @@ class JokeGenerator:
         Returns:
             A string containing a mom joke
         """
-        return self._random.choice(MOM_JOKES)
+        return self._choice(self._mom)
 
     def get_joke(self, joke_type: Literal["dad", "mom"]) -> str:
         """
@@ -22,6 +22,12 @@ from .jokes import JokeGenerator
 # Initialize joke generator
 joke_gen = JokeGenerator()
 
+# Tool name -> joke function
+_TOOL_IMPL = {
+    "get_dad_joke": joke_gen.get_dad_joke,
+    "get_mom_joke": joke_gen.get_mom_joke,
+}
+
 
 async def serve() -> None:
     """
@@ -81,14 +87,10 @@ async def serve() -> None:
         Raises:
             ValueError: If tool name is not recognized
         """
-        if name == "get_dad_joke":
-            joke = joke_gen.get_dad_joke()
-            return [TextContent(type="text", text=joke)]
-        elif name == "get_mom_joke":
-            joke = joke_gen.get_mom_joke()
-            return [TextContent(type="text", text=joke)]
-        else:
+        fn = _TOOL_IMPL.get(name)
+        if fn is None:
             raise ValueError(f"Unknown tool: {name}")
+        return [TextContent(type="text", text=fn())]
 
     # Run the server using stdio transport
     async with stdio_server() as (read_stream, write_stream):
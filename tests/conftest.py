@@ -0,0 +1,39 @@
+"""
+Shared fixtures for the joke MCP server tests.
+"""
+
+import asyncio
+import sys
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+
+from joke_mcp_server.http_server import app
+
+from .helpers import post_rpc, rpc
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Run async tests on uvloop where it is available (it has no Windows support)."""
+    if sys.platform == "win32":
+        return asyncio.DefaultEventLoopPolicy()
+    import uvloop
+    return uvloop.EventLoopPolicy()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client():
+    """One HTTP client bound to the app, shared by every test in the session."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def tools_list(client):
+    """The unauthenticated tools/list result, fetched once per session."""
+    response, data = await post_rpc(client, rpc("tools/list", id=0))
+    assert response.status_code == 200
+    return data["result"]["tools"]
@@ -0,0 +1,78 @@
+"""
+Helpers shared by the joke MCP server tests.
+"""
+
+from typing import Any
+
+import orjson
+
+from joke_mcp_server.http_server import app
+
+# Fields shared by every JSON-RPC message the tests send
+BASE = {"jsonrpc": "2.0"}
+
+
+def rpc(method: str, params: Any = None, id: Any = 1) -> dict:
+    """Build a JSON-RPC request message from the BASE template."""
+    return {**BASE, "id": id, "method": method, "params": {} if params is None else params}
+
+
+async def post_rpc(client, payload, headers=None):
+    """
+    Post a JSON-RPC payload to /mcp, encoding and decoding with orjson.
+
+    Returns:
+        Tuple of (response, decoded JSON body)
+    """
+    response = await client.post(
+        "/mcp",
+        content=orjson.dumps(payload),
+        headers={"content-type": "application/json", **(headers or {})},
+    )
+    return response, orjson.loads(response.content)
+
+
+async def asgi_post(body: bytes):
+    """
+    Post an encoded JSON body to /mcp by calling the ASGI app directly.
+
+    Skips the HTTP client and transport layers entirely.
+
+    Returns:
+        Tuple of (status code, decoded JSON body)
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/mcp",
+        "raw_path": b"/mcp",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"test"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("testclient", 50000),
+        "server": ("test", 80),
+    }
+    sent = False
+    messages = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status = messages[0]["status"]
+    content = b"".join(m.get("body", b"") for m in messages[1:])
+    return status, orjson.loads(content)
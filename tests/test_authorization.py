@@ -5,87 +5,123 @@ Tests the authorization middleware, protected resource metadata,
 and token validation following MCP specification.
 """
 
+import asyncio
+import json
+import time
+
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
-from httpx import AsyncClient, ASGITransport
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-from joke_mcp_server.http_server import app
+from joke_mcp_server import auth
+
+from .helpers import post_rpc, rpc
+
+
+# Test signing key, published through a mocked JWKS endpoint
+_PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_PUBLIC_JWK = {
+    **RSAAlgorithm.to_jwk(_PRIVATE_KEY.public_key(), as_dict=True),
+    "kid": "test-key",
+    "use": "sig",
+}
+JWKS = {"keys": [_PUBLIC_JWK]}
+
+
+def make_token(kid: str = "test-key", **claims) -> str:
+    """Create a signed access token for the test realm."""
+    now = int(time.time())
+    payload = {
+        "iss": f"{auth.KEYCLOAK_URL}/realms/{auth.KEYCLOAK_REALM}",
+        "sub": "test-user",
+        "iat": now,
+        "exp": now + 300,
+        "scope": "openid tools:mom_jokes",
+        **claims,
+    }
+    return jwt.encode(payload, _PRIVATE_KEY, algorithm="RS256", headers={"kid": kid})
+
+
+def mock_jwks_client(status_code: int = 200, etag: str = '"v1"') -> Mock:
+    """Create an HTTP client mock that serves the test JWKS."""
+    response = Mock(
+        status_code=status_code,
+        content=json.dumps(JWKS).encode(),
+        headers={"etag": etag},
+    )
+
+    async def get(*args, **kwargs):
+        # Yield to the event loop like a real network call would
+        await asyncio.sleep(0)
+        return client.get.return_value
+
+    client = Mock()
+    client.get = AsyncMock(side_effect=get, return_value=response)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def no_auth_bypass(monkeypatch):
+    """Exercise real authorization even when the environment enables the bypass."""
+    monkeypatch.setenv("ALLOW_AUTH_BYPASS", "false")
+    monkeypatch.setattr(auth, "ALLOW_AUTH_BYPASS", False)
 
 
 class TestAuthorizationFlow:
     """Test suite for OAuth 2.1 authorization flow."""
 
     @pytest.mark.asyncio
-    async def test_unprotected_tool_accessible_without_token(self):
+    async def test_unprotected_tool_accessible_without_token(self, client):
         """Test that dad jokes (unprotected) are accessible without authentication."""
-        transport = ASGITransport(app=app)
-        async with AsyncClient(transport=transport, base_url="http://test") as client:
-            message = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "tools/call",
-                "params": {"name": "get_dad_joke", "arguments": {}},
-            }
-            response = await client.post("/mcp", json=message)
-            assert response.status_code == 200
-            data = response.json()
-            assert "result" in data
-            assert "content" in data["result"]
+        message = rpc("tools/call", {"name": "get_dad_joke", "arguments": {}})
+        response, data = await post_rpc(client, message)
+        assert response.status_code == 200
+        assert "result" in data
+        assert "content" in data["result"]
 
     @pytest.mark.asyncio
-    async def test_protected_tool_returns_401_without_token(self):
+    async def test_protected_tool_returns_401_without_token(self, client):
         """Test that mom jokes (protected) return 401 without authentication."""
-        transport = ASGITransport(app=app)
-        async with AsyncClient(transport=transport, base_url="http://test") as client:
-            message = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "tools/call",
-                "params": {"name": "get_mom_joke", "arguments": {}},
-            }
-            response = await client.post("/mcp", json=message)
-            # This test will initially fail as we haven't implemented auth yet
-            # Once implemented, it should return 401
-            # assert response.status_code == 401
-            # assert "WWW-Authenticate" in response.headers
-            # For now, it returns 200
-            assert response.status_code in [200, 401]
+        message = rpc("tools/call", {"name": "get_mom_joke", "arguments": {}})
+        response, data = await post_rpc(client, message)
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"].startswith("Bearer resource_metadata=")
 
-    @pytest.mark.asyncio
+    @pytest.mark.skip(reason="pending implementation")
     async def test_www_authenticate_header_format(self):
         """Test that WWW-Authenticate header follows RFC 9728 format."""
         # This will be implemented when we add authorization
         pass
 
     @pytest.mark.asyncio
-    async def test_protected_resource_metadata_endpoint(self):
+    async def test_protected_resource_metadata_endpoint(self, client):
         """Test the /.well-known/oauth-protected-resource endpoint."""
-        transport = ASGITransport(app=app)
-        async with AsyncClient(transport=transport, base_url="http://test") as client:
-            response = await client.get("/.well-known/oauth-protected-resource")
-            # Will fail initially, then pass once implemented
-            if response.status_code == 200:
-                data = response.json()
-                assert "resource" in data
-                assert "authorization_servers" in data
-            else:
-                # Not implemented yet
-                assert response.status_code == 404
+        response = await client.get("/.well-known/oauth-protected-resource")
+        # Will fail initially, then pass once implemented
+        if response.status_code == 200:
+            data = response.json()
+            assert "resource" in data
+            assert "authorization_servers" in data
+        else:
+            # Not implemented yet
+            assert response.status_code == 404
 
-    @pytest.mark.asyncio
+    @pytest.mark.skip(reason="pending implementation")
     async def test_token_validation_with_valid_token(self):
         """Test that valid tokens are accepted for protected resources."""
         # Will be implemented with mock token validation
         pass
 
-    @pytest.mark.asyncio
+    @pytest.mark.skip(reason="pending implementation")
     async def test_token_validation_with_invalid_token(self):
         """Test that invalid tokens are rejected."""
         # Will be implemented with mock token validation
         pass
 
-    @pytest.mark.asyncio
+    @pytest.mark.skip(reason="pending implementation")
     async def test_token_validation_with_wrong_audience(self):
         """Test that tokens with wrong audience are rejected."""
         # Will be implemented with mock token validation
@@ -96,52 +132,402 @@ class TestProtectedResourceMetadata:
     """Test suite for Protected Resource Metadata endpoint."""
 
     @pytest.mark.asyncio
-    async def test_metadata_structure(self):
+    async def test_metadata_structure(self, client):
         """Test that metadata follows RFC 9728 structure."""
-        transport = ASGITransport(app=app)
-        async with AsyncClient(transport=transport, base_url="http://test") as client:
-            response = await client.get("/.well-known/oauth-protected-resource")
-            if response.status_code == 200:
-                data = response.json()
-                # Check required fields
-                assert "resource" in data
-                assert isinstance(data["resource"], str)
-
-                # Check optional but recommended fields
-                if "authorization_servers" in data:
-                    assert isinstance(data["authorization_servers"], list)
-                if "scopes_supported" in data:
-                    assert isinstance(data["scopes_supported"], list)
-
-    @pytest.mark.asyncio
-    async def test_metadata_content_type(self):
+        response = await client.get("/.well-known/oauth-protected-resource")
+        if response.status_code == 200:
+            data = response.json()
+            # Check required fields
+            assert "resource" in data
+            assert isinstance(data["resource"], str)
+
+            # Check optional but recommended fields
+            if "authorization_servers" in data:
+                assert isinstance(data["authorization_servers"], list)
+            if "scopes_supported" in data:
+                assert isinstance(data["scopes_supported"], list)
+
+    @pytest.mark.asyncio
+    async def test_metadata_content_type(self, client):
         """Test that metadata endpoint returns correct content type."""
-        transport = ASGITransport(app=app)
-        async with AsyncClient(transport=transport, base_url="http://test") as client:
-            response = await client.get("/.well-known/oauth-protected-resource")
-            if response.status_code == 200:
-                assert "application/json" in response.headers.get("content-type", "")
+        response = await client.get("/.well-known/oauth-protected-resource")
+        if response.status_code == 200:
+            assert "application/json" in response.headers.get("content-type", "")
 
 
 class TestToolAuthorization:
     """Test suite for tool-specific authorization."""
 
     @pytest.mark.asyncio
-    async def test_tools_list_shows_authorization_requirement(self):
+    async def test_tools_list_shows_authorization_requirement(self, tools_list):
         """Test that tools/list indicates which tools require authorization."""
-        transport = ASGITransport(app=app)
-        async with AsyncClient(transport=transport, base_url="http://test") as client:
-            message = {"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}}
-            response = await client.post("/mcp", json=message)
-            assert response.status_code == 200
-            data = response.json()
-            tools = data["result"]["tools"]
-
-            # Check that tools have authorization indicators once implemented
-            for tool in tools:
-                if tool["name"] == "get_mom_joke":
-                    # This tool should indicate it requires auth (once implemented)
-                    pass
-                elif tool["name"] == "get_dad_joke":
-                    # This tool should not require auth
-                    pass
\ No newline at end of file
+        # Check that tools have authorization indicators once implemented
+        for tool in tools_list:
+            if tool["name"] == "get_mom_joke":
+                # This tool should indicate it requires auth (once implemented)
+                pass
+            elif tool["name"] == "get_dad_joke":
+                # This tool should not require auth
+                pass
+
+    @pytest.mark.asyncio
+    async def test_tools_list_validates_token_once(self, client):
+        """Test that tools/list with a scoped token shows protected tools after one validation."""
+        claims = {"sub": "test-user", "scope": "tools:mom_jokes"}
+        message = rpc("tools/list")
+
+        with patch.object(auth, "validate_token", AsyncMock(return_value=claims)) as validate:
+            _, data = await post_rpc(
+                client, message, headers={"Authorization": "Bearer token"}
+            )
+
+        names = [tool["name"] for tool in data["result"]["tools"]]
+        assert names == ["get_dad_joke", "get_mom_joke"]
+        assert validate.await_count == 1
+
+
+class TestJwksCache:
+    """Test suite for JWKS caching and token validation."""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        auth._jwks_cache.clear()
+        auth._token_cache.clear()
+        auth._jwks_forced_at = float("-inf")
+        yield
+        auth._jwks_cache.clear()
+        auth._token_cache.clear()
+        auth._jwks_forced_at = float("-inf")
+
+    @pytest.mark.asyncio
+    async def test_jwks_fetched_once_within_ttl(self):
+        """Test that repeated lookups are served from the cache."""
+        client = mock_jwks_client()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            assert await auth.get_jwks() == JWKS
+            assert await auth.get_jwks() == JWKS
+
+        assert client.get.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_jwks_revalidated_with_etag(self):
+        """Test that an expired entry is revalidated with If-None-Match."""
+        client = mock_jwks_client()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            await auth.get_jwks()
+
+            # Expire the entry and answer the revalidation with 304
+            url, (_, etag, cached, keys) = next(iter(auth._jwks_cache.items()))
+            auth._jwks_cache[url] = (0.0, etag, cached, keys)
+            client.get.return_value = Mock(status_code=304, headers={})
+
+            assert await auth.get_jwks() == JWKS
+
+        assert client.get.await_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+    @pytest.mark.asyncio
+    async def test_signing_keys_indexed_by_kid(self):
+        """Test that JWKS keys are prebuilt and indexed by key ID."""
+        client = mock_jwks_client()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            keys = await auth.get_signing_keys()
+
+        assert list(keys) == ["test-key"]
+
+    @pytest.mark.asyncio
+    async def test_valid_token_accepted(self):
+        """Test that a correctly signed token validates against the JWKS."""
+        client = mock_jwks_client()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            claims = await auth.validate_token(make_token())
+
+        assert claims["sub"] == "test-user"
+
+    @pytest.mark.asyncio
+    async def test_expired_token_rejected(self):
+        """Test that an expired token is rejected."""
+        client = mock_jwks_client()
+        token = make_token(exp=int(time.time()) - 60)
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            with pytest.raises(auth.AuthorizationError) as exc_info:
+                await auth.validate_token(token)
+
+        assert exc_info.value.detail == "Token has expired"
+
+    @pytest.mark.asyncio
+    async def test_wrong_issuer_rejected(self):
+        """Test that a token from another realm is rejected."""
+        client = mock_jwks_client()
+        token = make_token(iss="http://evil.example/realms/mcp")
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            with pytest.raises(auth.AuthorizationError) as exc_info:
+                await auth.validate_token(token)
+
+        assert exc_info.value.detail == "Invalid token claims"
+
+    @pytest.mark.asyncio
+    async def test_tampered_token_rejected(self):
+        """Test that a token whose payload was altered fails verification."""
+        client = mock_jwks_client()
+        header, _, signature = make_token().split(".")
+        _, payload, _ = make_token(sub="someone-else").split(".")
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            with pytest.raises(auth.AuthorizationError) as exc_info:
+                await auth.validate_token(f"{header}.{payload}.{signature}")
+
+        assert exc_info.value.detail == "Invalid token"
+
+    @pytest.mark.asyncio
+    async def test_validated_token_cached(self):
+        """Test that re-presenting a token skips signature verification."""
+        client = mock_jwks_client()
+        token = make_token()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)), \
+                patch.object(auth, "_check_claims", wraps=auth._check_claims) as check:
+            first = await auth.validate_token(token)
+            second = await auth.validate_token(token)
+
+        assert first == second
+        assert check.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_kid_revalidates_without_dropping_cache(self):
+        """Test that an unknown key ID triggers a conditional refetch that keeps cached tokens."""
+        client = mock_jwks_client()
+        token = make_token()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)), \
+                patch.object(auth, "_check_claims", wraps=auth._check_claims) as check:
+            await auth.validate_token(token)
+            epoch = auth._jwks_epoch
+
+            with pytest.raises(auth.AuthorizationError):
+                await auth.validate_token(make_token(kid="forged"))
+            await auth.validate_token(token)
+
+        assert client.get.await_count == 2
+        assert client.get.await_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+        assert auth._jwks_epoch == epoch
+        assert check.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_kid_refreshes_rate_limited(self):
+        """Test that repeated unknown key IDs force at most one early JWKS refresh."""
+        client = mock_jwks_client()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            await auth.get_jwks()
+            for i in range(3):
+                with pytest.raises(auth.AuthorizationError):
+                    await auth.validate_token(make_token(kid=f"forged-{i}"))
+
+        assert client.get.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_token_validations_share_one_verification(self):
+        """Test that identical tokens validated together are verified once."""
+        client = mock_jwks_client()
+        token = make_token()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)), \
+                patch.object(auth, "_verify_token", wraps=auth._verify_token) as verify:
+            results = await asyncio.gather(*(auth.validate_token(token) for _ in range(10)))
+
+        assert all(r["sub"] == "test-user" for r in results)
+        assert verify.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_jwks_misses_share_one_fetch(self):
+        """Test that concurrent cache misses trigger a single JWKS request."""
+        client = mock_jwks_client()
+
+        with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+            results = await asyncio.gather(*(auth.get_jwks() for _ in range(10)))
+
+        assert all(r == JWKS for r in results)
+        assert client.get.await_count == 1
+
+
+class TestBatchAuthorization:
+    """Test suite for batched tool authorization."""
+
+    @pytest.mark.asyncio
+    async def test_unprotected_tools_need_no_token(self):
+        """Test that a batch of public tools is allowed without credentials."""
+        results = await auth.check_tools_authorization(["get_dad_joke", "get_dad_joke"])
+        assert results == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_token_validated_once_for_batch(self):
+        """Test that protected tools in a batch share one token validation."""
+        claims = {"sub": "test-user", "scope": "tools:mom_jokes"}
+        credentials = Mock(credentials="token")
+
+        with patch.object(auth, "validate_token", AsyncMock(return_value=claims)) as validate:
+            results = await auth.check_tools_authorization(
+                ["get_mom_joke", "get_dad_joke", "get_mom_joke"], credentials
+            )
+
+        assert results == [claims, None, claims]
+        assert validate.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_request_validates_token_once(self, client):
+        """Test that a batch over /mcp reuses its up-front authorization in every handler."""
+        claims = {"sub": "test-user", "scope": "tools:mom_jokes"}
+        messages = [rpc("tools/call", {"name": "get_mom_joke", "arguments": {}}, id=i) for i in range(5)]
+        messages.append(rpc("tools/list", id=5))
+
+        with patch.object(auth, "validate_token", AsyncMock(return_value=claims)) as validate:
+            response, data = await post_rpc(
+                client, messages, headers={"Authorization": "Bearer token"}
+            )
+
+        assert response.status_code == 200
+        assert all("result" in item for item in data)
+        assert [tool["name"] for tool in data[5]["result"]["tools"]] == [
+            "get_dad_joke", "get_mom_joke"
+        ]
+        assert validate.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_protected_call_without_token_returns_401(self, client):
+        """Test that a batch with a rejected protected call carries the 401 challenge."""
+        messages = [
+            rpc("tools/call", {"name": "get_dad_joke", "arguments": {}}, id=1),
+            rpc("tools/call", {"name": "get_mom_joke", "arguments": {}}, id=2),
+        ]
+
+        response, data = await post_rpc(client, messages)
+
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"].startswith("Bearer resource_metadata=")
+        assert "result" in data[0]
+        assert data[1]["error"]["message"] == "Authorization required"
+
+
+class TestScopeCheck:
+    """Test suite for scope matching."""
+
+    @pytest.mark.parametrize("scope, expected", [
+        ("tools:mom_jokes", True),
+        ("openid tools:mom_jokes profile", True),
+        ("openid\ttools:mom_jokes", True),
+        ("tools:mom_jokes_admin", False),
+        ("admin:tools:mom_jokes", False),
+        ("openid profile", False),
+        ("", False),
+    ])
+    def test_has_scope(self, scope, expected):
+        """Test that only whole, whitespace-delimited scopes match."""
+        assert auth._has_scope(scope) is expected
+
+
+class TestAuthorizationMiddleware:
+    """Test suite for the ASGI authorization middleware."""
+
+    @staticmethod
+    async def run(path: str, headers: list) -> dict:
+        seen = {}
+
+        async def inner(scope, receive, send):
+            seen.update(scope)
+
+        middleware = auth.AuthorizationMiddleware(inner)
+        await middleware(
+            {"type": "http", "path": path, "raw_path": path.encode(), "headers": headers},
+            None,
+            None,
+        )
+        return seen
+
+    @pytest.mark.asyncio
+    async def test_bearer_token_extracted_for_protected_path(self):
+        """Test that the bearer token is exposed for /mcp requests."""
+        scope = await self.run("/mcp", [(b"authorization", b"Bearer abc.def.ghi")])
+        assert scope["state"]["bearer_token"] == "abc.def.ghi"
+
+    @pytest.mark.asyncio
+    async def test_unprotected_path_passed_through(self):
+        """Test that other paths are forwarded untouched."""
+        scope = await self.run("/health", [(b"authorization", b"Bearer abc.def.ghi")])
+        assert "state" not in scope
+
+
+class TestConfiguration:
+    """Test suite for environment configuration."""
+
+    @pytest.mark.asyncio
+    async def test_reload_config_picks_up_auth_bypass(self, monkeypatch):
+        """Test that reload_config re-reads ALLOW_AUTH_BYPASS."""
+        monkeypatch.setenv("ALLOW_AUTH_BYPASS", "true")
+        auth.reload_config()
+        try:
+            token_info = await auth.check_tool_authorization("get_mom_joke")
+            assert token_info["sub"] == "dev-user"
+        finally:
+            monkeypatch.undo()
+            auth.reload_config()
+
+    def test_reload_config_refreshes_metadata_json(self, monkeypatch):
+        """Test that the cached metadata JSON follows RESOURCE_SERVER_URL."""
+        monkeypatch.setenv("RESOURCE_SERVER_URL", "https://jokes.example.com")
+        auth.reload_config()
+        try:
+            metadata = json.loads(auth.get_protected_resource_metadata_json())
+            assert metadata["resource"] == "https://jokes.example.com"
+        finally:
+            monkeypatch.undo()
+            auth.reload_config()
+        metadata = json.loads(auth.get_protected_resource_metadata_json())
+        assert metadata["resource"] == auth.RESOURCE_SERVER_URL
+
+    def test_reload_config_drops_cached_keys_and_tokens(self):
+        """Test that keys and tokens cached under the old configuration are dropped."""
+        auth._jwks_cache[auth._JWKS_URL] = (float("inf"), '"v1"', JWKS, {})
+        auth._token_cache[(auth._jwks_epoch, b"digest")] = (0, {})
+        auth.reload_config()
+        assert not auth._jwks_cache
+        assert not auth._token_cache
+
+    @pytest.mark.asyncio
+    async def test_introspection_mode(self, monkeypatch):
+        """Test that AUTH_MODE=introspection validates tokens with Keycloak."""
+        token_info = {"active": True, "sub": "test-user", "scope": "tools:mom_jokes"}
+        client = Mock()
+        client.post = AsyncMock(return_value=Mock(status_code=200, json=lambda: token_info))
+
+        monkeypatch.setenv("AUTH_MODE", "introspection")
+        auth.reload_config()
+        try:
+            with patch.object(auth, "get_http_client", AsyncMock(return_value=client)):
+                assert await auth.validate_token("opaque-token") == token_info
+
+                client.post.return_value = Mock(status_code=200, json=lambda: {"active": False})
+                with pytest.raises(auth.AuthorizationError):
+                    await auth.validate_token("revoked-token")
+        finally:
+            monkeypatch.undo()
+            auth.reload_config()
+
+    @pytest.mark.asyncio
+    async def test_bypass_skips_keycloak(self, monkeypatch):
+        """Test that validate_token never contacts Keycloak in bypass mode."""
+        monkeypatch.setenv("ALLOW_AUTH_BYPASS", "true")
+        auth.reload_config()
+        try:
+            with patch.object(auth, "get_http_client", AsyncMock()) as get_client:
+                token_info = await auth.validate_token("not-a-jwt")
+            assert token_info["sub"] == "dev-user"
+            get_client.assert_not_awaited()
+        finally:
+            monkeypatch.undo()
+            auth.reload_config()